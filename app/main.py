@@ -3,29 +3,207 @@
 # Minimal FastAPI app for sentiment analysis.
 # Endpoints:
 #   GET  /health     -> quick "ok" check
-#   GET  /           -> serves the test page (static/index.html)
+#   GET  /           -> redirects to the test page (/static/index.html)
 #   POST /predict    -> returns sentiment + confidence + summary
+#                       (concurrent calls are micro-batched together)
+#   POST /predict_batch -> same, for a list of texts in one call
+#   GET  /cache_stats -> hits/misses of the prediction cache
 # Model:
-#   distilbert-base-uncased-finetuned-sst-2-english (CPU friendly)
+#   MODEL_NAME env var, default philschmid/tiny-bert-sst2-distilled
+#   (tiny BERT distilled on SST-2: much faster, a bit less accurate;
+#    MODEL_NAME=distilbert-base-uncased-finetuned-sst-2-english for the bigger one)
+#   exported once to ONNX and served with ONNX Runtime
+#   USE_INT8=1 -> serve an INT8 (dynamic quantized) copy instead
 # ---------------------------------------------------
 
+import asyncio
 import os
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Annotated, List, Optional, Tuple
+
+import numpy as np
+import onnxruntime as ort
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
-from pydantic import BaseModel, Field
-from transformers import pipeline
+from fastapi.responses import ORJSONResponse, RedirectResponse
+from fastapi.staticfiles import StaticFiles
+from pydantic import BaseModel, ConfigDict, Field
+from transformers import AutoConfig, AutoTokenizer
 
 # 1) Create your FastAPI app (the web server)
-app = FastAPI(title="Sentiment Analysis API")
+#    - the lifespan loads + warms the model up (once per server process),
+#      then starts/stops the micro-batching worker (see step 5)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global BATCH_QUEUE
+    load_model()
+    warmup()
+    BATCH_QUEUE = asyncio.Queue()
+    worker = asyncio.create_task(_batch_worker(BATCH_QUEUE))
+    try:
+        yield
+    finally:
+        worker.cancel()
+        BATCH_QUEUE = None
+
+#    - orjson serializes responses much faster than the stdlib json
+app = FastAPI(
+    title="Sentiment Analysis API",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
-# 2) Load the Hugging Face model once at startup
+# 2) Model settings + loading
+#    - nothing heavy happens at import: load_model() runs from the lifespan,
+#      so `python app/main.py` and each uvicorn worker hold exactly one copy
 #    - First run may download the model files (cached next runs)
-MODEL_NAME = "distilbert-base-uncased-finetuned-sst-2-english"
-nlp = pipeline("sentiment-analysis", model=MODEL_NAME)
+#    - First run also exports the model to ONNX (reused next runs)
+MODEL_NAME = os.getenv("MODEL_NAME", "philschmid/tiny-bert-sst2-distilled")
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # go up from app/
+# One exported file per model, e.g. "philschmid--tiny-bert-sst2-distilled.onnx"
+_ONNX_STEM = os.path.join(PROJECT_ROOT, MODEL_NAME.replace("/", "--"))
+ONNX_PATH = os.getenv("ONNX_PATH", _ONNX_STEM + ".onnx")
+ONNX_INT8_PATH = os.getenv("ONNX_INT8_PATH", _ONNX_STEM + "_quantized.onnx")
+# INT8 is opt-in: big win on AVX-512 VNNI CPUs, can be slower on older ones
+USE_INT8 = os.getenv("USE_INT8", "0") == "1"
+MAX_LENGTH = 128  # SST-2 style sentences are short; bounds the cost per call
+# Server worker processes (same env var uvicorn/gunicorn use)
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+# CPU threads for the model (OMP_NUM_THREADS wins if set);
+# cores are split between workers to avoid oversubscription
+NUM_THREADS = int(os.getenv("OMP_NUM_THREADS", max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY)))
+
+# Models name their labels differently ("NEGATIVE", "LABEL_0", ...) -> normalize once
+_LABEL_MAP = {"label_0": "negative", "neg": "negative", "label_1": "positive", "pos": "positive"}
+
+# Set by load_model()
+tokenizer = None
+session: Optional[ort.InferenceSession] = None
+LABELS: List[str] = []  # ["negative", "positive"]
+
+def _write_atomically(path: str, write) -> None:
+    """
+    Call write(tmp_path) on a temp file next to `path`, then rename it into place.
+    Several workers exporting at once (or a crash mid-export) can never leave
+    a half-written model behind: `path` is either missing or complete.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp.onnx")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def export_and_load() -> ort.InferenceSession:
+    """
+    Export the PyTorch model to ONNX (only if the file is missing),
+    optionally quantize it to INT8 (USE_INT8=1, also only once),
+    then open an ONNX Runtime session with all graph optimizations
+    (fused MatMul/GELU/LayerNorm kernels) on CPU.
+    The Docker image runs this at build time, so containers start without exporting.
+    """
+    if not os.path.exists(ONNX_PATH):
+        # torch is only needed for the one-time export
+        import torch
+        from transformers import AutoModelForSequenceClassification
+
+        # torchscript=True -> plain tuple outputs, friendly to tracing
+        model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME, torchscript=True)
+        model.eval()
+        dummy = AutoTokenizer.from_pretrained(MODEL_NAME)("warmup", return_tensors="pt")
+
+        def _export(tmp_path: str) -> None:
+            with torch.no_grad():
+                torch.onnx.export(
+                    model,
+                    (dummy["input_ids"], dummy["attention_mask"]),
+                    tmp_path,
+                    input_names=["input_ids", "attention_mask"],
+                    output_names=["logits"],
+                    opset_version=14,
+                    dynamic_axes={
+                        "input_ids": {0: "b", 1: "s"},
+                        "attention_mask": {0: "b", 1: "s"},
+                        "logits": {0: "b"},
+                    },
+                )
+
+        _write_atomically(ONNX_PATH, _export)
+
+    model_path = ONNX_PATH
+    if USE_INT8:
+        if not os.path.exists(ONNX_INT8_PATH):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            # Same recipe as optimum's AutoQuantizationConfig.avx512_vnni(is_static=False,
+            # per_channel=True): dynamic uint8 activations, per-channel int8 weights
+            _write_atomically(ONNX_INT8_PATH, lambda tmp_path: quantize_dynamic(
+                ONNX_PATH,
+                tmp_path,
+                per_channel=True,
+                reduce_range=False,
+                weight_type=QuantType.QInt8,
+            ))
+        model_path = ONNX_INT8_PATH
+
+    sess_options = ort.SessionOptions()
+    sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    sess_options.intra_op_num_threads = NUM_THREADS
+    return ort.InferenceSession(model_path, sess_options, providers=["CPUExecutionProvider"])
+
+def load_model() -> None:
+    """
+    Load tokenizer, labels and the ONNX Runtime session into the module globals.
+    """
+    global tokenizer, session, LABELS, _CACHE_LOWERCASE
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    config = AutoConfig.from_pretrained(MODEL_NAME)
+    LABELS = [
+        _LABEL_MAP.get(config.id2label[i].lower(), config.id2label[i].lower())
+        for i in range(config.num_labels)
+    ]
+    _CACHE_LOWERCASE = bool(getattr(tokenizer, "do_lower_case", False))
+    session = export_and_load()
+
+# Fast tokenizers are not safe to call from several threads at once
+_TOKENIZER_LOCK = threading.Lock()
+
+def _infer_batch(texts: List[str]) -> List[Tuple[str, float]]:
+    """
+    Run the model once on a list of texts (padded to the longest one).
+    Returns one (sentiment, confidence) pair per text.
+    """
+    with _TOKENIZER_LOCK:
+        enc = tokenizer(texts, return_tensors="np", padding=True, truncation=True, max_length=MAX_LENGTH)
+    logits = session.run(
+        None,
+        {"input_ids": enc["input_ids"], "attention_mask": enc["attention_mask"]},
+    )[0]  # shape: [len(texts), num_labels]
+
+    # Softmax (numerically stable) -> pick the best label per row
+    probs = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    probs /= probs.sum(axis=-1, keepdims=True)
+    idx = probs.argmax(axis=-1)
+    return [(LABELS[i], float(probs[row, i])) for row, i in enumerate(idx)]
+
+def warmup() -> None:
+    """
+    Run a few short/long inputs once (incl. the max-length case) so the first
+    real request doesn't pay for thread-pool spin-up and cold caches.
+    """
+    for n_words in (8, 64, 256):
+        _infer_batch(["a " * n_words])
 
 # 3) Define the input and output shapes (for validation and docs)
 class PredictIn(BaseModel):
-    # require at least 1 character; cap size to avoid huge payloads
+    # strip spaces while validating, then require at least 1 character
+    # (whitespace-only -> 422); cap size to avoid huge payloads
+    model_config = ConfigDict(str_strip_whitespace=True)
     text: str = Field(..., min_length=1, max_length=2000, description="English text")
 
 class PredictOut(BaseModel):
@@ -34,56 +212,200 @@ class PredictOut(BaseModel):
     confidence: float       # 0..1
     summary: str            # "text-sentiment-confidence"
 
-# 4) Small helper to find the test page (static/index.html)
-def _index_path() -> str:
-    # file is at: project_root/static/index.html
-    project_root = os.path.dirname(os.path.dirname(__file__))  # go up from app/
-    return os.path.join(project_root, "static", "index.html")
+class PredictBatchIn(BaseModel):
+    # same per-text rules as PredictIn; cap the list size too
+    model_config = ConfigDict(str_strip_whitespace=True)
+    texts: List[Annotated[str, Field(min_length=1, max_length=2000)]] = Field(
+        ..., min_length=1, max_length=64, description="English texts"
+    )
+
+def _to_out(text: str, sentiment: str, confidence: float) -> dict:
+    # Build the "text-sentiment-confidence" summary
+    # Plain dict in the PredictOut shape: we build every field ourselves,
+    # so it skips a second Pydantic validation pass on the way out
+    summary = f"{text}-{sentiment}-{confidence:.4f}"
+    return {
+        "text": text,
+        "sentiment": sentiment,
+        "confidence": confidence,
+        "summary": summary,
+    }
 
-# 5) Health check
+# 4) Health check
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
-# 6) Serve the test page at "/"
-@app.get("/")
-def root():
-    path = _index_path()
-    if not os.path.exists(path):
-        raise HTTPException(status_code=404, detail="index.html not found")
-    return FileResponse(path)
+# 5) Micro-batching: concurrent /predict calls wait up to MAX_WAIT_MS
+#    and share ONE tokenizer + model call (up to MAX_BATCH texts)
+MAX_BATCH = 16
+MAX_WAIT_MS = 8
+BATCH_QUEUE: Optional[asyncio.Queue] = None  # created by the lifespan
+
+async def _batch_worker(queue: asyncio.Queue) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        # Block until the first request arrives, then collect more for a few ms
+        items = [await queue.get()]
+        deadline = loop.time() + MAX_WAIT_MS / 1000.0
+        while len(items) < MAX_BATCH:
+            try:
+                items.append(queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(remaining, 0.001))
+
+        # Run the model off the event loop so new requests keep queueing
+        texts = [text for text, _future in items]
+        try:
+            results = await asyncio.to_thread(_infer_batch, texts)
+        except Exception as exc:
+            for _text, future in items:
+                if not future.done():
+                    future.set_exception(exc)
+            continue
+        for (_text, future), result in zip(items, results):
+            if not future.done():
+                future.set_result(result)
+
+# 6) LRU cache of predictions for repeated texts (demos, health probes...)
+#    Key = text with whitespace collapsed (+ lowercased if the tokenizer is
+#    uncased): the tokenizer splits on whitespace, so those variants predict the same.
+#    Only touched from the event loop thread -> no lock needed.
+CACHE_SIZE = 4096
+_CACHE_LOWERCASE = False  # set by load_model(): True if the tokenizer is uncased
+_CACHE: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+_CACHE_STATS = {"hits": 0, "misses": 0}
+
+def _cache_key(text: str) -> str:
+    key = " ".join(text.split())
+    return key.lower() if _CACHE_LOWERCASE else key
+
+def _cache_get(key: str) -> Optional[Tuple[str, float]]:
+    result = _CACHE.get(key)
+    if result is None:
+        _CACHE_STATS["misses"] += 1
+        return None
+    _CACHE.move_to_end(key)  # mark as recently used
+    _CACHE_STATS["hits"] += 1
+    return result
+
+def _cache_put(key: str, result: Tuple[str, float]) -> None:
+    _CACHE[key] = result
+    _CACHE.move_to_end(key)
+    if len(_CACHE) > CACHE_SIZE:
+        _CACHE.popitem(last=False)  # drop the least recently used
+
+async def _infer(text: str) -> Tuple[str, float]:
+    """
+    One text -> (sentiment, confidence): cache first, then the model.
+    """
+    key = _cache_key(text)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+
+    # Queue the text for the batching worker and wait for its result
+    if BATCH_QUEUE is None:
+        raise RuntimeError("Model not loaded: the app lifespan has not started")
+    future = asyncio.get_running_loop().create_future()
+    await BATCH_QUEUE.put((text, future))
+    result = await future
+
+    _cache_put(key, result)
+    return result
 
 # 7) Main prediction endpoint
-@app.post("/predict", response_model=PredictOut)
-def predict(payload: PredictIn):
-    # Clean/sanitize input
-    text = payload.text.strip()
-    if not text:
-        # Send a clear 400 error if empty text
-        raise HTTPException(status_code=400, detail="Text must not be empty")
-
-    # Run the model (returns list with one dict: {'label': 'POSITIVE', 'score': 0.99})
+# (PredictOut only documents the response in /docs; it is not re-validated)
+@app.post("/predict", responses={200: {"model": PredictOut}})
+async def predict(payload: PredictIn):
+    # Input is already stripped + non-empty (validated by PredictIn)
+    text = payload.text
+
+    # Run the model (cached / micro-batched, see steps 5 and 6)
     try:
-        out = nlp(text)[0]
+        sentiment, confidence = await _infer(text)
     except Exception:
         # If something unexpected happens inside the model call
         raise HTTPException(status_code=500, detail="Inference error")
 
-    # Normalize + build the "text-sentiment-confidence" summary
-    sentiment = out["label"].lower()    # "positive" or "negative"
-    confidence = float(out["score"])    # 0..1
-    summary = f"{text}-{sentiment}-{confidence:.4f}"
+    # Return a clean JSON (already a Response -> no second encoding pass)
+    return ORJSONResponse(_to_out(text, sentiment, confidence))
 
-    # Return a clean JSON
-    return PredictOut(
-        text=text,
-        sentiment=sentiment,
-        confidence=confidence,
-        summary=summary,
-    )
+# 8) Batch endpoint for clients that already have a list of texts
+#    (skips the queue: the list is one model call already;
+#     cached texts are answered without running the model)
+@app.post("/predict_batch", responses={200: {"model": List[PredictOut]}})
+async def predict_batch(payload: PredictBatchIn):
+    texts = payload.texts  # already stripped + non-empty (PredictBatchIn)
+
+    # Look each cache key up once: texts sharing a key (duplicates, case/space
+    # variants) count as one hit/miss and are sent to the model only once
+    keys = [_cache_key(t) for t in texts]
+    results = {}   # key -> (sentiment, confidence)
+    missing = {}   # key -> first text with that key (insertion-ordered)
+    for key, text in zip(keys, texts):
+        if key in results or key in missing:
+            continue
+        cached = _cache_get(key)
+        if cached is None:
+            missing[key] = text
+        else:
+            results[key] = cached
+
+    if missing:
+        try:
+            fresh = await asyncio.to_thread(_infer_batch, list(missing.values()))
+        except Exception:
+            raise HTTPException(status_code=500, detail="Inference error")
+        for key, result in zip(missing, fresh):
+            results[key] = result
+            _cache_put(key, result)
+
+    return ORJSONResponse([
+        _to_out(text, *results[key])
+        for text, key in zip(texts, keys)
+    ])
+
+# 9) Cache statistics (same fields as functools.lru_cache.cache_info())
+@app.get("/cache_stats")
+def cache_stats():
+    return {**_CACHE_STATS, "maxsize": CACHE_SIZE, "currsize": len(_CACHE)}
 
-# 8) Allow running with:  python app/main.py
+# 10) Serve static/ (incl. the test page) at /static straight from Starlette
+#     - on its own prefix, so wrong methods/paths on the API keep
+#       FastAPI's normal 405/404 answers
+#     - browsers/CDNs may keep the files for an hour
+class _CachedStaticFiles(StaticFiles):
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers.setdefault("Cache-Control", "public, max-age=3600")
+        return response
+
+app.mount("/static", _CachedStaticFiles(directory=os.path.join(PROJECT_ROOT, "static"), html=True), name="static")
+
+@app.get("/", include_in_schema=False)
+def root():
+    return RedirectResponse("/static/")
+
+# 11) Allow running with:  python app/main.py
+#     - uvloop + httptools: faster event loop and HTTP parsing
+#       (uvloop isn't available on Windows -> default asyncio loop there)
+#     - WEB_CONCURRENCY=N -> N worker processes (each loads its own model
+#       in its lifespan; this launcher process never loads one)
 if __name__ == "__main__":
     import uvicorn
+    sys.path.insert(0, PROJECT_ROOT)  # workers import "app.main" by name
     # Port 7860 : pratique pour Hugging Face Spaces aussi
-    uvicorn.run(app, host="127.0.0.1", port=7860)
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=7860,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        workers=WEB_CONCURRENCY,
+    )
@@ -1,7 +1,9 @@
 # benchmark.py
 # ------------------------------------------------------------
-# Local CPU benchmark for 3 small SST-2 sentiment models.
-# - Measures latency (avg/min/max/median/p95)
+# Local CPU benchmark for a few small SST-2 sentiment models.
+# - Measures latency (avg/min/max/median/p95) of the model call
+#   on pre-tokenized inputs padded to one fixed length
+#   (per-sample latency via timeit autorange; stats across samples)
 # - Simple accuracy on a tiny labeled set
 # - Prints a Markdown table + per-sample predictions
 #
@@ -10,13 +12,18 @@
 #
 # Optional: save output to a file:
 #   python benchmark.py > benchmark_results.md
+#
+# Optional: compile models with torch.compile (inductor) first:
+#   USE_COMPILE=1 python benchmark.py
 # ------------------------------------------------------------
 
-import time
-from statistics import mean, median
+import os
+import timeit
 from typing import List, Tuple, Dict, Any
 
-from transformers import pipeline
+import numpy as np
+import torch
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
 
 # ---------- Config ----------
 
@@ -25,6 +32,7 @@ MODELS: List[Tuple[str, str]] = [
     ("distilbert-base-uncased-finetuned-sst-2-english", "DistilBERT SST-2 (HF)"),
     ("textattack/distilbert-base-uncased-SST-2", "TextAttack DistilBERT SST-2"),
     ("textattack/albert-base-v2-SST-2", "TextAttack ALBERT v2 SST-2"),
+    ("philschmid/tiny-bert-sst2-distilled", "Tiny BERT SST-2 (API default)"),
 ]
 
 # Tiny labeled set for a quick, simple accuracy estimate.
@@ -40,12 +48,27 @@ SAMPLES: List[Tuple[str, str]] = [
     ("I am pleasantly surprised.", "positive"),
 ]
 
-# For more stable latency numbers, do multiple runs per sample
-RUNS_PER_SAMPLE = 3  # increase if you want smoother numbers
+# All samples are tokenized once and padded to this length, so every timed
+# call has the same shape (hot kernel/shape caches, no re-tokenizing).
+# SST-2 sentences are short: 32 tokens covers the samples above.
+PAD_LENGTH = 32
+
+# torch.compile fuses LayerNorm/Linear/GELU kernels, but adds compile time
+# to the cold start -> opt-in
+USE_COMPILE = os.getenv("USE_COMPILE", "0") == "1"
 
 
 # ---------- Helpers ----------
 
+# Lowercased model label -> normalized label (built once, one dict lookup per call)
+_LABEL_MAP: Dict[str, str] = {
+    "positive": "positive", "pos": "positive", "label_1": "positive", "1": "positive",
+    "negative": "negative", "neg": "negative", "label_0": "negative", "0": "negative",
+    # Some models might return 'neutral' on other tasks (not SST-2) — map to negative here.
+    "neutral": "negative",
+}
+
+
 def normalize_label(raw_label: str) -> str:
     """
     Normalize model output labels to {'positive','negative'}.
@@ -54,62 +77,75 @@ def normalize_label(raw_label: str) -> str:
     if raw_label is None:
         return "unknown"
     t = raw_label.strip().lower()
-    if t in {"positive", "pos", "label_1", "1"}:
-        return "positive"
-    if t in {"negative", "neg", "label_0", "0"}:
-        return "negative"
-    # Some models might return 'neutral' on other tasks (not SST-2) — map to negative here.
-    if t in {"neutral"}:
-        return "negative"
-    return t
-
-
-def p95(values: List[float]) -> float:
-    if not values:
-        return 0.0
-    vals = sorted(values)
-    idx = int(0.95 * (len(vals) - 1))
-    return vals[idx]
+    return _LABEL_MAP.get(t, t)
 
 
 def run_one(model_name: str) -> Dict[str, Any]:
     """
-    Load one model pipeline on CPU and benchmark on the SAMPLES set.
+    Load one model (tokenizer + classifier) on CPU and benchmark on the SAMPLES set.
+    Samples are tokenized once up front; each timed call runs the model
+    directly (no pipeline glue) on one shape-stable row -> argmax.
     Returns metrics + per-sample predictions.
     """
-    clf = pipeline("sentiment-analysis", model=model_name, device=-1)  # device=-1 => CPU
-
-    # Warmup (fills caches, avoids first-call overhead in measurements)
-    _ = clf("warmup")
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()  # CPU, no dropout
+    if USE_COMPILE:
+        model = torch.compile(model, mode="reduce-overhead", dynamic=True)
+
+    # Pre-tokenize every sample once, padded to PAD_LENGTH, then slice one row per input
+    enc = tokenizer(
+        [text for text, _expected in SAMPLES],
+        padding="max_length",
+        max_length=PAD_LENGTH,
+        truncation=True,
+        return_tensors="pt",
+    )
+    rows = [{k: v[i:i + 1] for k, v in enc.items()} for i in range(len(SAMPLES))]
+
+    def clf(inputs: Dict[str, torch.Tensor]) -> Tuple[str, float]:
+        # inference_mode: no autograd bookkeeping / version counters
+        with torch.inference_mode():
+            logits = model(**inputs).logits[0]
+        probs = logits.softmax(-1)
+        idx = int(probs.argmax())
+        return model.config.id2label[idx], float(probs[idx])
+
+    # Warmup (fills caches, avoids first-call overhead in measurements;
+    # with USE_COMPILE it also compiles for the one fixed shape)
+    _ = clf(rows[0])
 
     latencies_ms: List[float] = []
     correct = 0
     preds: List[Tuple[str, str, str, float]] = []  # (text, expected, predicted, confidence)
 
-    for text, expected in SAMPLES:
-        for _ in range(RUNS_PER_SAMPLE):
-            t0 = time.perf_counter()
-            out = clf(text)[0]  # {'label': 'POSITIVE'|'NEGATIVE', 'score': float}
-            dt_ms = (time.perf_counter() - t0) * 1000.0
-            latencies_ms.append(dt_ms)
+    for (text, expected), inputs in zip(SAMPLES, rows):
+        # autorange picks the loop count so timer overhead stays negligible
+        # (runs for >= 0.2 s); one per-call latency per sample
+        loops, elapsed = timeit.Timer(lambda inputs=inputs: clf(inputs)).autorange()
+        latencies_ms.append(elapsed * 1000.0 / loops)
 
-        pred_label = normalize_label(out["label"])
-        conf = float(out["score"])
+        raw_label, score = clf(inputs)  # ('POSITIVE'|'NEGATIVE'|'LABEL_1'..., float)
+        pred_label = normalize_label(raw_label)
+        conf = score
         preds.append((text, expected, pred_label, conf))
         if pred_label == expected:
             correct += 1
 
+    # All latency stats (across samples) from one numpy array (percentile uses O(n) selection, no full sort)
+    lat = np.asarray(latencies_ms)
+    p50, p95 = np.percentile(lat, [50, 95])
+
     n = len(SAMPLES)
     metrics = {
-        "avg_ms": mean(latencies_ms),
-        "min_ms": min(latencies_ms),
-        "max_ms": max(latencies_ms),
-        "med_ms": median(latencies_ms),
-        "p95_ms": p95(latencies_ms),
+        "avg_ms": float(np.mean(lat)),
+        "min_ms": float(np.min(lat)),
+        "max_ms": float(np.max(lat)),
+        "med_ms": float(p50),
+        "p95_ms": float(p95),
         "acc": correct / n,
         "preds": preds,
         "num_samples": n,
-        "runs_per_sample": RUNS_PER_SAMPLE,
+        "pad_length": PAD_LENGTH,
     }
     return metrics
 
@@ -129,7 +165,8 @@ def main():
 
     # Summary as Markdown
     print("\n## Mini-Benchmark (CPU)")
-    print(f"*Samples:* {len(SAMPLES)}  ·  *Runs/sample:* {RUNS_PER_SAMPLE}\n")
+    print(f"*Samples:* {len(SAMPLES)}  ·  *Timing:* timeit autorange per sample  ·  "
+          f"*Padded length:* {PAD_LENGTH} tokens\n")
     print("| Model | Avg ms | Median | p95 | Min | Max | Accuracy |")
     print("|---|---:|---:|---:|---:|---:|---:|")
     for model_id, pretty, r in all_results:
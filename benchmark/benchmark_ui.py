@@ -5,6 +5,7 @@
 # ------------------------------------------------------------
 
 import gradio as gr
+import torch
 from transformers import pipeline
 from transformers.utils import logging as hf_logging
 
@@ -33,18 +34,20 @@ SAMPLES = [
 # Cache the pipelines so we load each model once
 _PIPELINES = {}
 
+# Lowercased model label -> "positive" / "negative" (built once)
+_LABEL_MAP = {
+    "positive": "positive", "pos": "positive", "label_1": "positive", "1": "positive",
+    "negative": "negative", "neg": "negative", "label_0": "negative", "0": "negative",
+}
+
 def _normalize(label: str) -> str:
-    t = (label or "").strip().lower()
-    if t in {"positive", "pos", "label_1", "1"}:
-        return "positive"
-    if t in {"negative", "neg", "label_0", "0"}:
-        return "negative"
     # SST-2 shouldn’t return neutral; if it does, treat as negative for this demo
-    return "negative"
+    return _LABEL_MAP.get((label or "").strip().lower(), "negative")
 
 def _get_pipeline(model_id: str):
     if model_id not in _PIPELINES:
         clf = pipeline("sentiment-analysis", model=model_id, device=-1)  # CPU
+        clf.model.eval()  # no dropout
         _PIPELINES[model_id] = clf
         try:
             clf("warmup")
@@ -54,33 +57,19 @@ def _get_pipeline(model_id: str):
 
 def _extract_texts(df_like) -> list[str]:
     """
-    Accepts a Gradio Dataframe payload (list-of-lists or pandas.DataFrame)
-    and returns a clean list of non-empty strings.
+    Accepts a Gradio Dataframe payload (list-of-lists, since the input
+    uses type="array") and returns a clean list of non-empty strings.
     """
-    try:
-        # If it's a pandas DataFrame
-        import pandas as pd  # type: ignore
-        if isinstance(df_like, pd.DataFrame):
-            values = df_like.iloc[:, 0].astype(str).tolist()
-        else:
-            # Expect list of rows like [[text], [text], ...]
-            values = []
-            for row in (df_like or []):
-                if isinstance(row, (list, tuple)) and row:
-                    values.append(str(row[0]))
-                elif isinstance(row, str):
-                    values.append(row)
-    except Exception:
-        # Fallback: try to iterate as list
-        values = []
-        for row in (df_like or []):
-            if isinstance(row, (list, tuple)) and row:
-                values.append(str(row[0]))
-            elif isinstance(row, str):
-                values.append(row)
+    # Expect list of rows like [[text], [text], ...] (plain strings tolerated)
+    values = []
+    for row in (df_like or []):
+        if isinstance(row, (list, tuple)) and row:
+            values.append(str(row[0]))
+        elif isinstance(row, str):
+            values.append(row)
 
     # Clean blanks and keep order
-    return [t.strip() for t in values if isinstance(t, str) and t.strip()]
+    return [t.strip() for t in values if t and t.strip()]
 
 def run_table(df_input) -> list[list[str]]:
     """
@@ -94,13 +83,18 @@ def run_table(df_input) -> list[list[str]]:
     # Load all models once
     clfs = [(_get_pipeline(mid), pretty) for mid, pretty in MODELS]
 
+    # One call per model with the WHOLE list: the pipeline batches internally
+    # (far less Python/tokenizer overhead than one call per text)
+    results = []
+    for clf, _pretty in clfs:
+        with torch.inference_mode():  # no autograd bookkeeping
+            outs = clf(texts, batch_size=8, truncation=True, max_length=128)
+        results.append(outs)  # one {'label': ..., 'score': ...} per text
+
+    # Transpose: one row per text, one column per model
     rows = []
-    for t in texts:
-        row = [t]
-        for clf, _pretty in clfs:
-            out = clf(t)[0]  # {'label': 'POSITIVE'|'NEGATIVE', 'score': float}
-            row.append(_normalize(out["label"]))
-        rows.append(row)
+    for i, t in enumerate(texts):
+        rows.append([t] + [_normalize(outs_per_model[i]["label"]) for outs_per_model in results])
     return rows
 
 
@@ -0,0 +1,21 @@
+"""
+tests/conftest.py
+-------------------------------------------------------
+Shared pytest fixtures.
+
+- `client`: ONE TestClient for the whole test session.
+  Entering it runs the app lifespan (model load + warmup + batching worker),
+  then one warmup /predict is sent so the tests only measure endpoint logic.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app  # this imports your FastAPI app (the model loads in its lifespan)
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as c:
+        c.post("/predict", json={"text": "warmup"})
+        yield c
@@ -5,18 +5,27 @@ Small, readable tests for your FastAPI sentiment API.
 
 WHAT WE TEST
 1) /health returns {"status":"ok"}.
-2) /docs (Swagger UI) is reachable.
+2) /docs (Swagger UI) is reachable, and / leads to the cacheable test page.
+   Wrong methods on API routes still get 405 (not swallowed by static files).
 3) /predict returns a valid response (200) for normal input.
 4) /predict returns clear errors for bad inputs:
-   - whitespace-only text -> 400 (our own check in the endpoint)
+   - whitespace-only text -> 422 (Pydantic strips, then min_length=1)
    - empty string -> 422 (Pydantic validation: min_length=1)
    - missing 'text' field -> 422 (Pydantic validation)
    - too-long text (> 2000 chars) -> 422 (Pydantic validation)
+5) /predict_batch returns one result per text, in order.
+6) Concurrent /predict calls are really micro-batched (one model call
+   with several texts) and each caller gets the result for ITS text.
+7) Repeated texts (ignoring case/extra spaces) hit the prediction cache.
 
 BONUS CHECK
 - "summary" follows "text-sentiment-confidence" convention:
   we check it ends with "<sentiment>-<confidence with 4 decimals>".
 
+SHARED CLIENT
+- The `client` fixture (tests/conftest.py) is created once per session,
+  with the app lifespan running and one warmup request already sent.
+
 HOW TO RUN
 - Install test dep:  pip install pytest
 - Run from project root (where the "app" folder is):  pytest -q
@@ -25,23 +34,23 @@ NOTE
 - First run may be slow because the model is downloaded once.
 """
 
-from fastapi.testclient import TestClient
-from app.main import app  # this imports your FastAPI app
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
 
-# Create a reusable client for all tests
-client = TestClient(app)
+import app.main as main
 
 
 # ---------- HEALTH & DOCS ----------
 
-def test_health_ok():
+def test_health_ok(client):
     """Basic liveness check."""
     res = client.get("/health")
     assert res.status_code == 200
     assert res.json() == {"status": "ok"}
 
 
-def test_docs_available():
+def test_docs_available(client):
     """
     Swagger UI should be available at /docs.
     We just check 200 and the returned content looks like HTML.
@@ -53,9 +62,29 @@ def test_docs_available():
         or "<!DOCTYPE html>" in res.text
 
 
+def test_index_page_is_cacheable(client):
+    """
+    "/" redirects to the test page, served as HTML with a Cache-Control header.
+    """
+    res = client.get("/")  # the client follows the redirect
+    assert res.status_code == 200
+    assert res.url.path == "/static/"
+    assert "text/html" in res.headers.get("content-type", "").lower()
+    assert res.headers.get("cache-control") == "public, max-age=3600"
+
+
+def test_wrong_method_on_api_route_returns_405(client):
+    """
+    Static files live under /static, so API routes keep their normal errors.
+    """
+    assert client.get("/predict").status_code == 405
+    assert client.get("/predict_batch").status_code == 405
+    assert client.post("/unknown").status_code == 404
+
+
 # ---------- PREDICT: HAPPY PATH ----------
 
-def test_predict_success_and_summary_format():
+def test_predict_success_and_summary_format(client):
     """
     Send a normal sentence and validate:
     - HTTP 200
@@ -86,20 +115,18 @@ def test_predict_success_and_summary_format():
 
 # ---------- PREDICT: ERROR CASES ----------
 
-def test_predict_whitespace_only_returns_400():
+def test_predict_whitespace_only_returns_422(client):
     """
-    Our endpoint strips the text; if the result is empty,
-    we raise HTTP 400 with a clear 'detail' message.
+    PredictIn strips the text while validating; the result is empty,
+    so Field(min_length=1) fails with a 422 BEFORE our endpoint runs.
     """
     res = client.post("/predict", json={"text": "   "})
-    assert res.status_code == 400
+    assert res.status_code == 422
     body = res.json()
     assert "detail" in body
-    # optional: assert a specific message substring
-    assert "must not be empty" in body["detail"].lower()
 
 
-def test_predict_empty_string_returns_422():
+def test_predict_empty_string_returns_422(client):
     """
     Empty string violates Pydantic Field(min_length=1),
     so FastAPI returns a 422 validation error BEFORE our endpoint runs.
@@ -110,7 +137,7 @@ def test_predict_empty_string_returns_422():
     assert "detail" in body  # standard FastAPI validation error shape
 
 
-def test_predict_missing_text_field_returns_422():
+def test_predict_missing_text_field_returns_422(client):
     """
     Missing the required 'text' field also triggers a 422 validation error.
     """
@@ -120,7 +147,7 @@ def test_predict_missing_text_field_returns_422():
     assert "detail" in body
 
 
-def test_predict_too_long_returns_422():
+def test_predict_too_long_returns_422(client):
     """
     Text longer than the declared max_length=2000 should be rejected by Pydantic.
     """
@@ -129,3 +156,111 @@ def test_predict_too_long_returns_422():
     assert res.status_code == 422
     body = res.json()
     assert "detail" in body
+
+
+# ---------- PREDICT_BATCH & MICRO-BATCHING ----------
+
+def test_predict_batch_returns_one_result_per_text(client):
+    """
+    Batch endpoint keeps the input order and uses the same output shape.
+    """
+    texts = ["I absolutely love this product!", "This is terrible and disappointing."]
+    res = client.post("/predict_batch", json={"texts": texts})
+    assert res.status_code == 200, res.text
+
+    data = res.json()
+    assert [d["text"] for d in data] == texts
+    for d in data:
+        assert set(d.keys()) == {"text", "sentiment", "confidence", "summary"}
+        assert d["sentiment"] in {"positive", "negative"}
+        assert 0.0 <= float(d["confidence"]) <= 1.0
+
+
+def test_predict_batch_whitespace_item_returns_422(client):
+    """
+    Same rule as /predict: a whitespace-only text fails validation (422).
+    """
+    res = client.post("/predict_batch", json={"texts": ["fine", "   "]})
+    assert res.status_code == 422
+    assert "detail" in res.json()
+
+
+def test_predict_concurrent_requests_use_batch_worker(client, monkeypatch):
+    """
+    The shared client runs the app lifespan, so /predict goes through
+    the micro-batching queue.
+    - mixed positive/negative texts: a result sent to the wrong caller shows up
+    - each response must match a direct model call on the same text
+    - the worker must have run at least one model call with several texts
+    """
+    positive = [f"I absolutely love it, truly wonderful experience #{i}" for i in range(4)]
+    negative = [f"I hated it, truly terrible and disappointing #{i}" for i in range(4)]
+    texts = [t for pair in zip(positive, negative) for t in pair]  # interleaved
+
+    # Reference results straight from the model (no cache, no queue)
+    expected = main._infer_batch(texts)
+    assert {sentiment for sentiment, _conf in expected} == {"positive", "negative"}
+
+    # Record the size of every model call made by the worker;
+    # widen the batching window so all concurrent calls land in it
+    batch_sizes = []
+    real_infer_batch = main._infer_batch
+
+    def recording_infer_batch(batch):
+        batch_sizes.append(len(batch))
+        return real_infer_batch(batch)
+
+    monkeypatch.setattr(main, "_infer_batch", recording_infer_batch)
+    monkeypatch.setattr(main, "MAX_WAIT_MS", 200)
+
+    with ThreadPoolExecutor(max_workers=len(texts)) as pool:
+        responses = list(pool.map(lambda t: client.post("/predict", json={"text": t}), texts))
+
+    for text, (sentiment, confidence), res in zip(texts, expected, responses):
+        assert res.status_code == 200, res.text
+        data = res.json()
+        assert data["text"] == text
+        assert data["sentiment"] == sentiment
+        assert data["confidence"] == pytest.approx(confidence, abs=1e-4)
+
+    assert sum(batch_sizes) == len(texts)  # every text went through the worker once
+    assert max(batch_sizes) > 1            # ... and some of them shared a model call
+
+
+# ---------- PREDICTION CACHE ----------
+
+def test_repeated_text_hits_cache(client):
+    """
+    The same text (different case / spacing) is served from the cache
+    and /cache_stats reports the hit.
+    """
+    client.post("/predict", json={"text": "What a   lovely day"})
+    before = client.get("/cache_stats").json()
+
+    res = client.post("/predict", json={"text": "what a lovely DAY"})
+    assert res.status_code == 200, res.text
+    assert res.json()["text"] == "what a lovely DAY"  # response keeps the caller's text
+
+    after = client.get("/cache_stats").json()
+    assert after["hits"] == before["hits"] + 1
+    assert after["misses"] == before["misses"]
+    assert set(after.keys()) == {"hits", "misses", "maxsize", "currsize"}
+
+
+def test_predict_batch_dedupes_texts_sharing_a_cache_key(client):
+    """
+    Texts with the same cache key in one batch are looked up (and run) once:
+    one miss, no hits, one new cache entry, and both get the same result.
+    """
+    before = client.get("/cache_stats").json()
+
+    texts = ["  I love  this dedupe batch ", "I LOVE this dedupe batch"]
+    res = client.post("/predict_batch", json={"texts": texts})
+    assert res.status_code == 200, res.text
+    first, second = res.json()
+    assert (first["sentiment"], first["confidence"]) == (second["sentiment"], second["confidence"])
+
+    after = client.get("/cache_stats").json()
+    assert after["misses"] == before["misses"] + 1
+    assert after["hits"] == before["hits"]
+    assert after["currsize"] == before["currsize"] + 1